@@ -0,0 +1,50 @@
+"""
+Comment tree indexing, kept in its own fully-annotated module so it can be
+compiled with mypyc:
+
+    cd backend && mypyc community/_tree.py
+
+That drops a community/_tree.*.so next to this file, which Python imports
+in preference to the .py — no code changes, and deleting the .so falls
+back to the pure-Python version. Build artifacts are gitignored; the
+compiled module is an optional deployment step, not a requirement.
+
+Keep this module dependency-free (no Django imports) so mypyc can compile
+it standalone.
+"""
+from typing import Any
+
+Row = dict[str, Any]
+
+
+def build_tree(rows: list[Row]) -> tuple[list[list[int]], list[int]]:
+    """
+    Index the tree of flat comment rows (in path order, as returned by
+    Comment.objects.tree_rows) — O(n) time, no lookups by id.
+
+    Nodes are referred to by their index in `rows`; the rows themselves
+    are left untouched. Returns (children, roots): children[i] lists the
+    indexes of row i's replies, roots the indexes of top-level comments.
+
+    Path order is a preorder walk of the tree, so the current row's parent
+    is always the nearest open row with a smaller depth: keep a stack of
+    (depth, child list) for the open ancestors, pop until it's on top,
+    append, push.
+    """
+    children: list[list[int]] = []
+    roots: list[int] = []
+    depths: list[int] = [-1]
+    open_lists: list[list[int]] = [roots]
+    i: int = 0
+    for row in rows:
+        depth: int = row['depth']
+        while depths[-1] >= depth:
+            depths.pop()
+            open_lists.pop()
+        open_lists[-1].append(i)
+        replies: list[int] = []
+        children.append(replies)
+        depths.append(depth)
+        open_lists.append(replies)
+        i += 1
+    return children, roots
@@ -0,0 +1,69 @@
+"""
+Karma writes. Every KarmaEvent is mirrored into its KarmaRollup hour
+bucket (see LeaderboardView); going through here keeps the two in step.
+"""
+from .models import KarmaEvent, KarmaRollup
+
+
+class KarmaBuffer:
+    """
+    Collects karma events and writes them in one go: a multi-row INSERT
+    into KarmaEvent plus one rollup upsert per flush, instead of two
+    statements per event. For bulk writers like seed_data; a single like
+    writes its one event directly (see LikeToggleView).
+
+        karma = KarmaBuffer()
+        for ...:
+            karma.queue(user_id=..., amount=..., reason=...,
+                        related_type=..., related_id=...)
+        karma.flush()
+
+    Flush inside the transaction that wrote the likes, so likes, events
+    and rollup commit (or roll back) together.
+    """
+    BATCH_SIZE = 500
+
+    def __init__(self):
+        self.pending = []
+
+    def queue(self, **fields):
+        self.pending.append(KarmaEvent(**fields))
+
+    def flush(self):
+        events, self.pending = self.pending, []
+        if events:
+            # bulk_create fills in created_at (auto_now_add) on the instances
+            KarmaEvent.objects.bulk_create(events, batch_size=self.BATCH_SIZE)
+            KarmaRollup.objects.add(
+                (event.user_id, event.created_at, event.amount) for event in events
+            )
+        return events
+
+
+def revoke(user_id, reason, related_type, related_id):
+    """
+    Remove the most recent matching karma event and take it back out of
+    the hour bucket it was counted in. Returns False if there was none.
+
+    Backends can't DELETE ... LIMIT 1, so the event is looked up first,
+    then deleted by pk with _raw_delete: one bare DELETE, no Collector
+    pass (karma events have no dependents or delete signals).
+    """
+    event = (
+        KarmaEvent.objects
+        .filter(
+            user_id=user_id,
+            reason=reason,
+            related_type=related_type,
+            related_id=related_id,
+        )
+        .order_by('-created_at')
+        .values_list('pk', 'created_at', 'amount')
+        .first()
+    )
+    if event is None:
+        return False
+    pk, created_at, amount = event
+    KarmaEvent.objects.filter(pk=pk)._raw_delete(KarmaEvent.objects.db)
+    KarmaRollup.objects.add([(user_id, created_at, -amount)])
+    return True
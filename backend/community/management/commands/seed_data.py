@@ -1,6 +1,9 @@
 from django.core.management.base import BaseCommand
+from django.contrib.auth.hashers import make_password
 from django.contrib.auth.models import User
-from community.models import Post, Comment, Like, KarmaEvent
+from community.models import Post, Comment, PostLike, CommentLike
+from community.karma import KarmaBuffer
+from django.db import connection, transaction
 from django.utils import timezone
 from datetime import timedelta
 import random
@@ -9,18 +12,42 @@ import random
 class Command(BaseCommand):
     help = 'Seed the database with sample data for testing'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='Random seed for the generated comment likes (same seed, same data)',
+        )
+
     def handle(self, *args, **options):
+        if connection.vendor == 'sqlite':
+            # Dev seeding only: skip the per-commit fsync on the local DB file
+            with connection.cursor() as cursor:
+                cursor.execute('PRAGMA synchronous=NORMAL')
+
+        # One transaction for the whole seed: a single commit instead of one
+        # per statement, and a failed run leaves nothing half-seeded.
+        with transaction.atomic():
+            self._seed(random.Random(options['seed']))
+
+    def _seed(self, rng):
         self.stdout.write('Seeding database...')
 
         # Create users
         usernames = ['alice', 'bob', 'charlie', 'diana', 'eve', 'frank']
-        users = []
-        for name in usernames:
-            user, created = User.objects.get_or_create(username=name)
-            if created:
-                user.set_password('password123')
-                user.save()
-            users.append(user)
+        existing = User.objects.in_bulk(usernames, field_name='username')
+        # bulk_create bypasses save()/set_password, so hash up front — once.
+        # The hash embeds its own random salt; sharing it across seed users
+        # (who share the password anyway) saves a full PBKDF2 run per user.
+        password_hash = make_password('password123')
+        missing = [
+            User(username=name, password=password_hash)
+            for name in usernames if name not in existing
+        ]
+        if missing:
+            User.objects.bulk_create(missing, ignore_conflicts=True)
+            # ignore_conflicts leaves PKs unset; read the full set back once
+            existing = User.objects.in_bulk(usernames, field_name='username')
+        users = [existing[name] for name in usernames]
 
         # Create posts
         post_contents = [
@@ -34,13 +61,12 @@ class Command(BaseCommand):
             "Built an entire backend API in 4 hours using Django + DRF. The ecosystem is genuinely underrated in 2024. Framework batteries-included philosophy pays off.",
         ]
 
-        posts = []
-        for i, content in enumerate(post_contents):
-            post = Post.objects.create(
-                author=users[i % len(users)],
-                content=content,
-            )
-            posts.append(post)
+        # bulk_create skips Post.save(), so author_username is set here
+        posts = [
+            Post(author=users[i % len(users)], author_username=users[i % len(users)].username, content=content)
+            for i, content in enumerate(post_contents)
+        ]
+        Post.objects.bulk_create(posts)
 
         # Create comments with nesting
         comment_threads = [
@@ -93,98 +119,86 @@ class Command(BaseCommand):
             },
         ]
 
+        # Build every Comment in memory first; parent indexes are relative to
+        # their own thread, so resolve them to the (still unsaved) instances.
         all_comments = []
         for thread in comment_threads:
-            post = thread['post']
-            created_comments = []  # list of (index_in_thread, Comment object)
-            for i, c in enumerate(thread['comments']):
-                parent = None
-                if c['parent'] is not None:
-                    # parent index is relative to THIS thread's comments
-                    parent = created_comments[c['parent']][1]
-                comment = Comment.objects.create(
-                    post=post,
+            thread_comments = []
+            for c in thread['comments']:
+                parent = thread_comments[c['parent']] if c['parent'] is not None else None
+                comment = Comment(
+                    post=thread['post'],
                     author=c['author'],
                     content=c['content'],
                     parent=parent,
                 )
-                created_comments.append((i, comment))
+                thread_comments.append(comment)
                 all_comments.append(comment)
 
+        Comment.bulk_create_tree(all_comments)
+
         # Create likes and karma events
         # Like some posts
         like_pairs = [
-            (users[1], 'post', posts[0].pk),
-            (users[2], 'post', posts[0].pk),
-            (users[3], 'post', posts[0].pk),
-            (users[4], 'post', posts[0].pk),
-            (users[1], 'post', posts[1].pk),
-            (users[0], 'post', posts[1].pk),
-            (users[3], 'post', posts[1].pk),
-            (users[2], 'post', posts[2].pk),
-            (users[4], 'post', posts[2].pk),
-            (users[5], 'post', posts[2].pk),
-            (users[0], 'post', posts[3].pk),
-            (users[1], 'post', posts[3].pk),
-            (users[2], 'post', posts[3].pk),
-            (users[3], 'post', posts[4].pk),
-            (users[4], 'post', posts[4].pk),
-            (users[5], 'post', posts[5].pk),
-            (users[0], 'post', posts[5].pk),
-            (users[1], 'post', posts[6].pk),
-            (users[2], 'post', posts[7].pk),
-            (users[3], 'post', posts[7].pk),
-            (users[4], 'post', posts[7].pk),
-            (users[5], 'post', posts[7].pk),
+            (users[1], posts[0]),
+            (users[2], posts[0]),
+            (users[3], posts[0]),
+            (users[4], posts[0]),
+            (users[1], posts[1]),
+            (users[0], posts[1]),
+            (users[3], posts[1]),
+            (users[2], posts[2]),
+            (users[4], posts[2]),
+            (users[5], posts[2]),
+            (users[0], posts[3]),
+            (users[1], posts[3]),
+            (users[2], posts[3]),
+            (users[3], posts[4]),
+            (users[4], posts[4]),
+            (users[5], posts[5]),
+            (users[0], posts[5]),
+            (users[1], posts[6]),
+            (users[2], posts[7]),
+            (users[3], posts[7]),
+            (users[4], posts[7]),
+            (users[5], posts[7]),
         ]
 
-        for user, target_type, target_id in like_pairs:
-            like, created = Like.objects.get_or_create(
-                user=user, target_type=target_type, target_id=target_id
-            )
-            if created:
-                # Award karma to the post/comment author
-                if target_type == 'post':
-                    target = Post.objects.get(pk=target_id)
-                    Post.objects.filter(pk=target_id).update(like_count=Post.objects.get(pk=target_id).like_count + 1)
-                    if target.author != user:
-                        KarmaEvent.objects.create(
-                            user=target.author,
-                            amount=5,
-                            reason='post_like',
-                            related_type='post',
-                            related_id=target_id,
-                        )
-
-        # Like some comments  
+        post_likes = []
         comment_likes = []
+        karma = KarmaBuffer()
+        for user, post in like_pairs:
+            post_likes.append(PostLike(user=user, post=post))
+            # Award karma to the post author (no self-karma)
+            if post.author_id != user.pk:
+                karma.queue(
+                    user_id=post.author_id,
+                    amount=5,
+                    reason='post_like',
+                    related_type='post',
+                    related_id=post.pk,
+                )
+
+        # Like some comments
         for comment in all_comments[:12]:
             # Each comment gets 1-3 random likes from other users
             potential_likers = [u for u in users if u != comment.author]
-            num_likes = random.randint(1, 3)
-            for liker in random.sample(potential_likers, min(num_likes, len(potential_likers))):
-                like, created = Like.objects.get_or_create(
-                    user=liker, target_type='comment', target_id=comment.pk
+            num_likes = rng.randint(1, 3)
+            for liker in rng.sample(potential_likers, min(num_likes, len(potential_likers))):
+                comment_likes.append(CommentLike(user=liker, comment=comment))
+                karma.queue(
+                    user=comment.author,
+                    amount=1,
+                    reason='comment_like',
+                    related_type='comment',
+                    related_id=comment.pk,
                 )
-                if created:
-                    Comment.objects.filter(pk=comment.pk).update(
-                        like_count=Comment.objects.get(pk=comment.pk).like_count + 1
-                    )
-                    if comment.author != liker:
-                        KarmaEvent.objects.create(
-                            user=comment.author,
-                            amount=1,
-                            reason='comment_like',
-                            related_type='comment',
-                            related_id=comment.pk,
-                        )
-
-        # Recompute like counts accurately
-        for post in posts:
-            post.like_count = Like.objects.filter(target_type='post', target_id=post.pk).count()
-            post.save()
-        for comment in all_comments:
-            comment.like_count = Like.objects.filter(target_type='comment', target_id=comment.pk).count()
-            comment.save()
+
+        PostLike.objects.bulk_create(post_likes, ignore_conflicts=True)
+        CommentLike.objects.bulk_create(comment_likes, ignore_conflicts=True)
+        # One multi-row INSERT for the events, mirrored into the hourly
+        # rollup with one upsert per (user, hour)
+        karma.flush()
 
         self.stdout.write(self.style.SUCCESS(f'Successfully seeded: {len(users)} users, {len(posts)} posts, {len(all_comments)} comments'))
+
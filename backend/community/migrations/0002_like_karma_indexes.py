@@ -0,0 +1,27 @@
+# Generated by Django 5.0.14 on 2026-10-15 22:16
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('community', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='karmaevent',
+            index=models.Index(fields=['created_at', 'user'], name='karma_created_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='karmaevent',
+            index=models.Index(fields=['user', 'created_at'], name='karma_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='like',
+            index=models.Index(fields=['target_type', 'target_id'], name='like_target_idx'),
+        ),
+    ]
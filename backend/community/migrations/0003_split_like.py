@@ -0,0 +1,73 @@
+# Generated by Django 5.0.14 on 2026-10-15 22:16
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('community', '0002_like_karma_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CommentLike',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('comment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='likes', to='community.comment')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='comment_likes', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'comment')},
+            },
+        ),
+        migrations.CreateModel(
+            name='PostLike',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='likes', to='community.post')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='post_likes', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'post')},
+            },
+        ),
+        # Copy existing likes into the concrete tables. Likes whose target no
+        # longer exists are dropped (there was no FK to keep them consistent).
+        migrations.RunSQL(
+            sql=[
+                """
+                INSERT INTO community_postlike (user_id, post_id, created_at)
+                SELECT l.user_id, l.target_id, l.created_at
+                FROM community_like l
+                JOIN community_post p ON p.id = l.target_id
+                WHERE l.target_type = 'post'
+                """,
+                """
+                INSERT INTO community_commentlike (user_id, comment_id, created_at)
+                SELECT l.user_id, l.target_id, l.created_at
+                FROM community_like l
+                JOIN community_comment c ON c.id = l.target_id
+                WHERE l.target_type = 'comment'
+                """,
+            ],
+            reverse_sql=[
+                """
+                INSERT INTO community_like (user_id, target_type, target_id, created_at)
+                SELECT user_id, 'post', post_id, created_at FROM community_postlike
+                """,
+                """
+                INSERT INTO community_like (user_id, target_type, target_id, created_at)
+                SELECT user_id, 'comment', comment_id, created_at FROM community_commentlike
+                """,
+            ],
+        ),
+        migrations.DeleteModel(
+            name='Like',
+        ),
+    ]
@@ -0,0 +1,74 @@
+# Generated by Django 5.0.14 on 2026-10-15 22:20
+
+from django.conf import settings
+from django.db import migrations, models
+
+PATH_STEPLEN = 10
+PATH_MAX_LENGTH = 250  # the new column width: 25 levels (depth 0..24)
+
+
+def rebuild_paths(apps, schema_editor, dotted=False):
+    """
+    Recompute every Comment.path from the parent chain. Parents are always
+    shallower than their replies, so walking by depth sees them first.
+
+    All paths are computed before any is written: nesting used to be
+    unlimited, and a thread deeper than the new column allows would
+    otherwise only fail at the AlterField below, after the rewrite. Such
+    threads stop the migration here instead, with the comments to fix.
+    """
+    Comment = apps.get_model('community', 'Comment')
+    paths = {}
+    comments = []
+    for comment in Comment.objects.order_by('depth', 'id').only('id', 'parent_id', 'path'):
+        step = str(comment.id) if dotted else format(comment.id, f'0{PATH_STEPLEN}X')
+        if comment.parent_id is None:
+            comment.path = step
+        elif dotted:
+            comment.path = f"{paths[comment.parent_id]}.{step}"
+        else:
+            comment.path = paths[comment.parent_id] + step
+        paths[comment.id] = comment.path
+        comments.append(comment)
+
+    if not dotted:
+        too_deep = [c.id for c in comments if len(c.path) > PATH_MAX_LENGTH]
+        if too_deep:
+            raise RuntimeError(
+                f"{len(too_deep)} comment(s) are nested deeper than "
+                f"{PATH_MAX_LENGTH // PATH_STEPLEN} levels, which the new "
+                f"{PATH_MAX_LENGTH}-character path column can't hold "
+                f"(ids: {too_deep[:20]}{' ...' if len(too_deep) > 20 else ''}). "
+                "Delete or re-parent them, then run the migration again."
+            )
+
+    Comment.objects.bulk_update(comments, ['path'], batch_size=500)
+
+
+def rebuild_dotted_paths(apps, schema_editor):
+    rebuild_paths(apps, schema_editor, dotted=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('community', '0004_comment_path_prefix_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='comment',
+            name='comment_path_prefix_idx',
+        ),
+        migrations.RunPython(rebuild_paths, rebuild_dotted_paths),
+        migrations.AlterField(
+            model_name='comment',
+            name='path',
+            field=models.CharField(default='', max_length=250),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['path'], name='comment_path_prefix_idx', opclasses=['varchar_pattern_ops']),
+        ),
+    ]
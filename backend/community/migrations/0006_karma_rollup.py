@@ -0,0 +1,51 @@
+# Generated by Django 5.0.14 on 2026-10-15 22:22
+
+import datetime
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Sum
+from django.db.models.functions import TruncHour
+
+
+def backfill_rollup(apps, schema_editor):
+    """Build the hourly buckets from the existing KarmaEvent log."""
+    KarmaEvent = apps.get_model('community', 'KarmaEvent')
+    KarmaRollup = apps.get_model('community', 'KarmaRollup')
+    buckets = (
+        KarmaEvent.objects
+        .annotate(hour=TruncHour('created_at', tzinfo=datetime.timezone.utc))
+        .values('user_id', 'hour')
+        .annotate(total=Sum('amount'))
+        .order_by()
+    )
+    KarmaRollup.objects.bulk_create(
+        [KarmaRollup(user_id=b['user_id'], hour=b['hour'], amount=b['total']) for b in buckets],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('community', '0005_fixed_width_comment_path'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='KarmaRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField()),
+                ('amount', models.IntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='karma_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['hour', 'user'], name='karma_rollup_hour_user_idx')],
+                'unique_together': {('user', 'hour')},
+            },
+        ),
+        migrations.RunPython(backfill_rollup, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.0.14 on 2026-10-15 22:32
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('community', '0006_karma_rollup'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='karmaevent',
+            name='karma_created_user_idx',
+        ),
+        migrations.AddIndex(
+            model_name='karmaevent',
+            index=models.Index(fields=['created_at', 'user', 'amount'], name='karma_created_user_amt_idx'),
+        ),
+    ]
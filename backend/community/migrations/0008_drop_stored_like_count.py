@@ -0,0 +1,37 @@
+# Generated by Django 5.0.14 on 2026-10-15 22:33
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('community', '0007_karma_event_covering_index'),
+    ]
+
+    operations = [
+        # Backwards only: once the columns are back, fill them from the likes
+        migrations.RunSQL(
+            sql=migrations.RunSQL.noop,
+            reverse_sql=[
+                """
+                UPDATE community_post SET like_count = (
+                    SELECT COUNT(*) FROM community_postlike WHERE post_id = community_post.id
+                )
+                """,
+                """
+                UPDATE community_comment SET like_count = (
+                    SELECT COUNT(*) FROM community_commentlike WHERE comment_id = community_comment.id
+                )
+                """,
+            ],
+        ),
+        migrations.RemoveField(
+            model_name='comment',
+            name='like_count',
+        ),
+        migrations.RemoveField(
+            model_name='post',
+            name='like_count',
+        ),
+    ]
@@ -0,0 +1,39 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('community', '0009_post_feed_keyset_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='author_username',
+            field=models.CharField(default='', editable=False, max_length=150),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='author_username',
+            field=models.CharField(default='', editable=False, max_length=150),
+            preserve_default=False,
+        ),
+        # Copy the current usernames in (backwards: the columns just go away)
+        migrations.RunSQL(
+            sql=[
+                """
+                UPDATE community_post SET author_username = (
+                    SELECT username FROM auth_user WHERE auth_user.id = community_post.author_id
+                )
+                """,
+                """
+                UPDATE community_comment SET author_username = (
+                    SELECT username FROM auth_user WHERE auth_user.id = community_comment.author_id
+                )
+                """,
+            ],
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,18 @@
+from rest_framework.pagination import CursorPagination
+
+
+class FeedCursor(CursorPagination):
+    """
+    Keyset pagination for the feed: the opaque ?cursor= encodes the last
+    created_at seen, so every page is an index range scan
+    (WHERE created_at < ? ORDER BY created_at DESC, id DESC LIMIT n+1)
+    on post_created_id_idx, however deep the client scrolls. OFFSET
+    paging made the database read and discard every earlier row.
+
+    id breaks ties between posts created in the same instant, so the
+    order — and the pages — are stable.
+    """
+    ordering = ('-created_at', '-id')
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
@@ -0,0 +1,29 @@
+import orjson
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+# orjson handles dict/list/str/int/datetime natively; anything else
+# (Decimal, lazy translation strings, ...) goes through DRF's encoder.
+_fallback = JSONEncoder().default
+
+
+class ORJSONRenderer(BaseRenderer):
+    """
+    Drop-in replacement for DRF's JSONRenderer, backed by orjson.
+
+    The post detail response is a tree of plain dicts (see
+    serialize_comment_tree); orjson encodes it, datetimes included, in C
+    instead of json.dumps + isoformat() per field.
+    """
+    media_type = 'application/json'
+    format = 'json'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return orjson.dumps(
+            data,
+            default=_fallback,
+            option=orjson.OPT_NAIVE_UTC | orjson.OPT_UTC_Z,
+        )
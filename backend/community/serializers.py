@@ -1,114 +1,153 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
-from .models import Post, Comment, Like, KarmaEvent
+from django.contrib.auth.hashers import make_password
+from .models import Post, Comment
+from ._tree import build_tree
 
 
-class UserSerializer(serializers.ModelSerializer):
-    class Meta:
-        model = User
-        fields = ['id', 'username']
-
-
-class CommentSerializer(serializers.Serializer):
+def serialize_comment_tree(rows, children, roots):
     """
-    Recursive serializer for the comment tree.
-    
+    Serialize the comment tree into plain dicts.
+
     This is called AFTER we've already fetched all comments in a single query
-    and reconstructed the tree in Python (see PostDetailView).
-    
-    Each comment dict already has a 'children' key populated by the view.
-    We just serialize the structure here — no additional DB hits.
+    (see PostDetailView) and indexed the tree with _tree.build_tree: `rows`
+    are the flat comment rows, children[i] the indexes of row i's replies,
+    `roots` the indexes of top-level comments.
+
+    We walk it with an explicit stack instead of instantiating a nested
+    CommentSerializer per node — no serializer objects, no per-field
+    to_representation calls, no recursion limit on deep threads.
+    Each comment becomes exactly one output dict.
+    Datetimes are left as-is for the renderer to encode.
     """
-    id = serializers.IntegerField()
-    author = serializers.SerializerMethodField()
-    content = serializers.CharField()
-    depth = serializers.IntegerField()
-    like_count = serializers.IntegerField()
-    created_at = serializers.DateTimeField()
-    children = serializers.SerializerMethodField()
-    parent_id = serializers.IntegerField(allow_null=True)
-    is_liked = serializers.BooleanField(default=False)
+    serialized = []
+    stack = [(i, serialized) for i in reversed(roots)]
+    while stack:
+        i, siblings = stack.pop()
+        row = rows[i]
+        replies = []
+        siblings.append({
+            'id': row['id'],
+            'author': {'id': row['author_id'], 'username': row['author_username']},
+            'content': row['content'],
+            'depth': row['depth'],
+            'like_count': row['like_count'],
+            'created_at': row['created_at'],
+            'children': replies,
+            'parent_id': row['parent_id'],
+            'is_liked': row['is_liked'],
+        })
+        stack.extend((child, replies) for child in reversed(children[i]))
+    return serialized
+
+
+def serialize_comment_list(rows):
+    """
+    Serialize comments as a flat list (path order), without 'children'.
 
-    def get_author(self, obj):
-        # obj is a dict built in the view
-        return {'id': obj['author_id'], 'username': obj['author_username']}
+    Same fields as serialize_comment_tree; parent_id and depth are all a
+    client needs to reassemble the tree. Pure field copy, no nesting.
+    """
+    return [
+        {
+            'id': row['id'],
+            'author': {'id': row['author_id'], 'username': row['author_username']},
+            'content': row['content'],
+            'depth': row['depth'],
+            'like_count': row['like_count'],
+            'created_at': row['created_at'],
+            'parent_id': row['parent_id'],
+            'is_liked': row['is_liked'],
+        }
+        for row in rows
+    ]
+
+
+def author_dict(obj):
+    """
+    {'id', 'username'} for obj's author, built directly from the post's
+    own author_id and author_username columns — no auth_user row needed.
 
-    def get_children(self, obj):
-        children = obj.get('children', [])
-        return CommentSerializer(children, many=True).data
+    Same output as a nested User serializer with fields ['id', 'username'],
+    without running a second serializer's field machinery for every row.
+    """
+    return {'id': obj.author_id, 'username': obj.author_username}
 
 
 class PostListSerializer(serializers.ModelSerializer):
-    """Lightweight serializer for the feed list — no comments loaded."""
-    author = UserSerializer(read_only=True)
-    is_liked = serializers.SerializerMethodField()
+    """
+    Lightweight serializer for the feed list — no comments loaded.
+
+    Reads like_count and is_liked from the annotations PostListView puts
+    on its queryset (no per-post queries).
+    """
+    author = serializers.SerializerMethodField()
+    like_count = serializers.IntegerField(read_only=True)
+    is_liked = serializers.BooleanField(read_only=True)
 
     class Meta:
         model = Post
         fields = ['id', 'author', 'content', 'like_count', 'created_at', 'is_liked']
 
-    def get_is_liked(self, obj):
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            # This uses a prefetched set if available
-            return Like.objects.filter(
-                user=request.user, target_type='post', target_id=obj.pk
-            ).exists()
-        return False
+    def get_author(self, obj):
+        return author_dict(obj)
 
 
 class PostDetailSerializer(serializers.ModelSerializer):
     """
     Full serializer for a single post with its comment tree.
-    The 'comments' field is populated manually by the view with the
-    reconstructed tree — it's not a standard DRF nested serializer
-    that would trigger N+1 queries.
+    The 'comments' field is built here from the flat comment rows the view
+    attaches (one query) — it's not a standard DRF nested serializer
+    that would trigger N+1 queries. like_count and is_liked come from
+    Post.objects.for_viewer() annotations.
     """
-    author = UserSerializer(read_only=True)
+    author = serializers.SerializerMethodField()
+    like_count = serializers.IntegerField(read_only=True)
     comments = serializers.SerializerMethodField()
-    is_liked = serializers.SerializerMethodField()
+    is_liked = serializers.BooleanField(read_only=True)
 
     class Meta:
         model = Post
         fields = ['id', 'author', 'content', 'like_count', 'created_at', 'comments', 'is_liked']
 
-    def get_is_liked(self, obj):
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            return Like.objects.filter(
-                user=request.user, target_type='post', target_id=obj.pk
-            ).exists()
-        return False
+    def get_author(self, obj):
+        return author_dict(obj)
 
     def get_comments(self, obj):
-        # The view attaches _comment_tree to the post instance
-        comment_tree = getattr(obj, '_comment_tree', [])
-        return CommentSerializer(comment_tree, many=True).data
+        # The view attaches the flat comment rows (path order) to the post
+        rows = getattr(obj, '_comment_rows', [])
+        if self.context.get('flat_comments'):
+            return serialize_comment_list(rows)
+        return serialize_comment_tree(rows, *build_tree(rows))
 
 
 class PostCreateSerializer(serializers.ModelSerializer):
+    # A post that was just created has no likes yet — no query.
+    like_count = serializers.IntegerField(default=0, read_only=True)
+
     class Meta:
         model = Post
         fields = ['id', 'content', 'author', 'like_count', 'created_at']
-        read_only_fields = ['id', 'author', 'like_count', 'created_at']
+        read_only_fields = ['id', 'author', 'created_at']
 
 
 class CommentCreateSerializer(serializers.ModelSerializer):
     class Meta:
         model = Comment
         fields = ['id', 'content', 'parent', 'post', 'author', 'depth', 'like_count', 'created_at', 'parent_id', 'is_liked']
-        read_only_fields = ['id', 'post', 'author', 'depth', 'like_count', 'created_at']
+        read_only_fields = ['id', 'post', 'author', 'depth', 'created_at']
 
-    # Extra fields that don't exist on model but we return
-    is_liked = serializers.SerializerMethodField()
+    # Only the columns CommentCreateView and Comment.save() read off the parent
+    parent = serializers.PrimaryKeyRelatedField(
+        queryset=Comment.objects.only('id', 'post_id', 'path', 'depth'),
+        allow_null=True,
+        required=False,
+    )
 
-    def get_is_liked(self, obj):
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            return Like.objects.filter(
-                user=request.user, target_type='comment', target_id=obj.pk
-            ).exists()
-        return False
+    # Extra fields that don't exist on model but we return.
+    # A comment that was just created can't have been liked yet — no query.
+    like_count = serializers.IntegerField(default=0, read_only=True)
+    is_liked = serializers.BooleanField(default=False, read_only=True)
 
 
 class LeaderboardSerializer(serializers.Serializer):
@@ -127,5 +166,11 @@ class RegisterSerializer(serializers.ModelSerializer):
         fields = ['id', 'username', 'password']
 
     def create(self, validated_data):
-        user = User.objects.create_user(**validated_data)
+        # Same result as create_user() (normalized username, hashed password),
+        # built directly: one hash, one INSERT, no manager indirection.
+        user = User(
+            username=User.normalize_username(validated_data['username']),
+            password=make_password(validated_data['password']),
+        )
+        user.save()
         return user
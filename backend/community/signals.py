@@ -0,0 +1,26 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .models import Post, Comment
+
+
+@receiver(post_save, sender=User, dispatch_uid='community_sync_author_username')
+def sync_author_username(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Keep the author_username copies on Post and Comment in step with a
+    renamed user.
+
+    Users are saved far more often than they're renamed (login writes
+    last_login with update_fields), so saves that can't have touched the
+    username are skipped, and the UPDATEs only rewrite stale rows.
+    """
+    if created or (update_fields is not None and 'username' not in update_fields):
+        return
+    for model in (Post, Comment):
+        (
+            model.objects
+            .filter(author_id=instance.pk)
+            .exclude(author_username=instance.username)
+            .update(author_username=instance.username)
+        )
@@ -1,20 +1,29 @@
-from django.db import IntegrityError, transaction
+from django.db import transaction
 from django.utils import timezone
+from django.core.cache import cache
+from django.utils.cache import patch_cache_control
+from django.utils.decorators import method_decorator
+from django.views.decorators.cache import cache_control
+from django.contrib.auth import login as auth_login, logout as auth_logout
 from django.contrib.auth.models import User
-from django.db.models import Sum, Count, Q
+from django.db.models import Sum
 from rest_framework import status, generics
 from rest_framework.decorators import api_view, permission_classes
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from datetime import timedelta
+import random
+import time
 
-from .models import Post, Comment, Like, KarmaEvent
+from .models import Post, Comment, PostLike, CommentLike, KarmaEvent, KarmaRollup
 from .serializers import (
     PostListSerializer, PostDetailSerializer, PostCreateSerializer,
     CommentCreateSerializer, LeaderboardSerializer, RegisterSerializer,
-    UserSerializer,
 )
+from .karma import revoke as revoke_karma
+from .pagination import FeedCursor
 
 
 # ─────────────────────────────────────────────────────────────────────
@@ -30,8 +39,7 @@ class RegisterView(generics.CreateAPIView):
         serializer.is_valid(raise_exception=True)
         user = serializer.save()
         # Auto-login after registration
-        from django.contrib.auth import login
-        login(request, user)
+        auth_login(request, user)
         return Response({'id': user.id, 'username': user.username}, status=status.HTTP_201_CREATED)
 
 
@@ -48,15 +56,13 @@ def login_view(request):
         return Response({'error': 'Invalid credentials'}, status=401)
     if not user.check_password(password):
         return Response({'error': 'Invalid credentials'}, status=401)
-    from django.contrib.auth import login
-    login(request, user)
+    auth_login(request, user)
     return Response({'id': user.id, 'username': user.username})
 
 
 @api_view(['POST'])
 def logout_view(request):
-    from django.contrib.auth import logout
-    logout(request)
+    auth_logout(request)
     return Response({'status': 'logged out'})
 
 
@@ -64,7 +70,11 @@ def logout_view(request):
 @permission_classes([AllowAny])
 def me_view(request):
     if request.user.is_authenticated:
-        return Response({'id': request.user.id, 'username': request.user.username, 'authenticated': True})
+        response = Response({'id': request.user.id, 'username': request.user.username, 'authenticated': True})
+        # Browser-only, briefly. Reading the session adds Vary: Cookie, so a
+        # login/logout (new cookie) never gets the old answer.
+        patch_cache_control(response, private=True, max_age=10)
+        return response
     return Response({'authenticated': False})
 
 
@@ -74,16 +84,31 @@ def me_view(request):
 
 class PostListView(generics.ListCreateAPIView):
     """
-    GET  /api/posts/  — Feed listing (paginated, no comments loaded)
+    GET  /api/posts/  — Feed listing (cursor-paginated, no comments loaded)
     POST /api/posts/  — Create a new post
     """
+    pagination_class = FeedCursor
+
     def get_serializer_class(self):
         if self.request.method == 'POST':
             return PostCreateSerializer
         return PostListSerializer
 
     def get_queryset(self):
-        return Post.objects.select_related('author').order_by('-created_at')
+        """
+        The whole page in ONE statement, from community_post alone: each
+        post row carries its author's id and username (author_username is
+        stored on the post — no auth_user JOIN), its like count (correlated
+        COUNT subquery) and whether the current user liked it (EXISTS
+        subquery, served by the (user, post) unique index). No per-post
+        lookups in the serializer.
+        """
+        # only() trims the row to the columns the serializer outputs
+        return (
+            Post.objects
+            .for_viewer(self.request.user)
+            .only('id', 'content', 'created_at', 'author_id', 'author_username')
+        )
 
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
@@ -100,75 +125,45 @@ class PostDetailView(generics.RetrieveAPIView):
     1. Fetch the post (1 query)
     2. Fetch ALL comments for this post in ONE query, ordered by path
        (this is the key — ordering by path gives us a predictable tree traversal order)
-    3. Reconstruct the tree IN PYTHON using a simple dict lookup
-    4. Attach the tree to the post instance
-    5. The serializer just walks the pre-built tree — zero additional queries
+    3. Attach the rows to the post instance
+    4. The serializer reconstructs the tree IN PYTHON (_tree.build_tree):
+       one pass over the path-ordered rows with a stack of open ancestors —
+       each row's parent is the nearest one on the stack with a smaller
+       depth, so no id lookups — and zero additional queries
+    5. ...and walks it into the nested response
 
     Total queries: 2 (one for post, one for all comments)
     Regardless of comment count or nesting depth.
+
+    FLAT MODE (?flat=1):
+    Skip steps 4-5 and return the comments as a flat list in path order, each
+    with parent_id and depth. No nested children arrays to build, serialize
+    or JSON.parse; the client rebuilds the tree in one pass over the list
+    (the frontend does this). The nested shape stays the default.
     """
     serializer_class = PostDetailSerializer
 
+    def flat_comments(self):
+        return self.request.query_params.get('flat') in ('1', 'true')
+
     def get_object(self):
         post_id = self.kwargs['pk']
+        user = self.request.user
         try:
-            post = Post.objects.select_related('author').get(pk=post_id)
+            post = Post.objects.for_viewer(user).get(pk=post_id)
         except Post.DoesNotExist:
-            from rest_framework.exceptions import NotFound
             raise NotFound("Post not found")
 
-        # ── SINGLE QUERY: fetch all comments with author info ──
-        # select_related('author') prevents N+1 on author lookups
-        comments_qs = (
-            Comment.objects
-            .filter(post=post)
-            .select_related('author')
-            .order_by('path')  # ordering by materialized path = tree order
-        )
-
-        # Build the tree in Python — O(n) time, O(n) space
-        # Map: comment_id -> comment_dict (with 'children' list)
-        comment_map = {}
-        root_comments = []
-
-        # Get liked comment IDs for current user in a single query
-        liked_comment_ids = set()
-        if self.request.user.is_authenticated:
-            liked_comment_ids = set(
-                Like.objects.filter(
-                    user=self.request.user,
-                    target_type='comment',
-                    target_id__in=[c.pk for c in comments_qs]
-                ).values_list('target_id', flat=True)
-            )
-
-        for comment in comments_qs:
-            node = {
-                'id': comment.pk,
-                'author_id': comment.author_id,
-                'author_username': comment.author.username,
-                'content': comment.content,
-                'depth': comment.depth,
-                'like_count': comment.like_count,
-                'created_at': comment.created_at,
-                'parent_id': comment.parent_id,
-                'children': [],
-                'is_liked': comment.pk in liked_comment_ids,
-            }
-            comment_map[comment.pk] = node
-
-            if comment.parent_id is None:
-                root_comments.append(node)
-            else:
-                # Attach to parent's children list
-                parent_node = comment_map.get(comment.parent_id)
-                if parent_node:
-                    parent_node['children'].append(node)
-
-        # Attach tree to post for the serializer
-        post._comment_tree = root_comments
+        # ── SINGLE QUERY: fetch all comments as flat dict rows ──
+        # Attached to the post; the serializer builds the tree from them.
+        post._comment_rows = list(Comment.objects.tree_rows(post.pk, user))
         return post
 
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['flat_comments'] = self.flat_comments()
+        return context
+
 
 class PostCreateView(generics.CreateAPIView):
     serializer_class = PostCreateSerializer
@@ -190,24 +185,27 @@ class CommentCreateView(generics.CreateAPIView):
     serializer_class = CommentCreateSerializer
 
     def perform_create(self, serializer):
+        """
+        The FKs are saved by id — neither the post nor the parent is loaded
+        as a full row just to be linked to:
+        - the parent is already fetched by the serializer's `parent` field,
+          trimmed to the columns save() needs (path, depth) plus post_id;
+          a parent on this post also proves the post exists
+        - a top-level comment only needs an EXISTS check on the post
+        """
         post_id = self.kwargs['post_id']
-        try:
-            post = Post.objects.get(pk=post_id)
-        except Post.DoesNotExist:
-            from rest_framework.exceptions import NotFound
-            raise NotFound("Post not found")
-
-        parent_id = self.request.data.get('parent')
-        parent = None
-        if parent_id:
-            try:
-                parent = Comment.objects.get(pk=parent_id, post=post)
-            except Comment.DoesNotExist:
-                from rest_framework.exceptions import NotFound
+        parent = serializer.validated_data.get('parent')
+        if parent is not None:
+            if parent.post_id != post_id:
                 raise NotFound("Parent comment not found")
+            # Each level adds a fixed-width step to the materialized path
+            if parent.depth + 1 >= Comment.MAX_DEPTH:
+                raise ValidationError({'parent': 'Maximum reply depth reached'})
+        elif not Post.objects.filter(pk=post_id).exists():
+            raise NotFound("Post not found")
 
         serializer.save(
-            post=post,
+            post_id=post_id,
             author=self.request.user,
             parent=parent
         )
@@ -225,15 +223,19 @@ class LikeToggleView(APIView):
     TOGGLE behavior: like if not liked, unlike if already liked.
 
     CONCURRENCY PROTECTION:
-    We rely on the database's UNIQUE constraint on (user, target_type, target_id).
-    If two requests arrive simultaneously for the same like:
-    - Both check "does this like exist?" — both see False (race window)
-    - Both try to INSERT
-    - The DB rejects the second with IntegrityError (unique violation)
-    - We catch it and return "already liked"
-
-    We also wrap the entire operation in a transaction.atomic() block
-    so that the like creation + karma event + like_count update are all-or-nothing.
+    We rely on the database's UNIQUE constraint on (user, post) / (user, comment).
+    There is no "does this like exist?" SELECT (and so no race window):
+    - We always try the INSERT first, as INSERT ... ON CONFLICT DO NOTHING
+    - If the like already exists, the DB inserts 0 rows — that IS the
+      "already liked" check (no IntegrityError, no savepoint rollback)
+    - We then take the unlike path instead
+    Two simultaneous toggles from the same user therefore act as two
+    toggles (like, then unlike), never as a double like.
+
+    The whole toggle runs in one transaction.atomic() block so that the
+    like row + karma event + rollup update are all-or-nothing.
+    There's no stored like count to update: it is counted from the like
+    rows whenever a post or comment is read.
     """
     permission_classes = [IsAuthenticated]
 
@@ -246,163 +248,197 @@ class LikeToggleView(APIView):
         if not target_id:
             return Response({'error': 'target_id required'}, status=400)
 
-        # Validate target exists
+        # Validate target exists and get its author in one tiny query:
+        # a single int back, no model instance built
         if target_type == 'post':
-            try:
-                target = Post.objects.get(pk=target_id)
-            except Post.DoesNotExist:
-                return Response({'error': 'Post not found'}, status=404)
+            target_model = Post
             karma_amount = 5  # Like on post = 5 karma
             karma_reason = 'post_like'
-            target_author = target.author
+            like_model, like_field = PostLike, 'post_id'
         else:
-            try:
-                target = Comment.objects.get(pk=target_id)
-            except Comment.DoesNotExist:
-                return Response({'error': 'Comment not found'}, status=404)
+            target_model = Comment
             karma_amount = 1  # Like on comment = 1 karma
             karma_reason = 'comment_like'
-            target_author = target.author
-
-        # Check if already liked (optimistic check before trying insert)
-        existing_like = Like.objects.filter(
-            user=request.user,
-            target_type=target_type,
-            target_id=target_id
-        ).first()
-
-        if existing_like:
-            # UNLIKE: remove like, remove karma, decrement count
-            with transaction.atomic():
-                existing_like.delete()
-                # Remove the corresponding karma event
-                KarmaEvent.objects.filter(
-                    user=target_author,
-                    reason=karma_reason,
-                    related_type=target_type,
-                    related_id=target_id,
-                    # Only delete the most recent one for this like
-                ).order_by('-created_at').first()
-                # Decrement like_count
-                if target_type == 'post':
-                    Post.objects.filter(pk=target_id).update(like_count=models.F('like_count') - 1)
-                else:
-                    Comment.objects.filter(pk=target_id).update(like_count=models.F('like_count') - 1)
-                # Delete karma event
-                KarmaEvent.objects.filter(
-                    user=target_author,
-                    reason=karma_reason,
-                    related_type=target_type,
-                    related_id=target_id,
-                ).order_by('-created_at')[:1].delete()
-
-            return Response({
-                'status': 'unliked',
-                'target_type': target_type,
-                'target_id': target_id,
-                'is_liked': False,
-            })
-        else:
-            # LIKE: try to create, catch race condition
-            try:
-                with transaction.atomic():
-                    Like.objects.create(
-                        user=request.user,
-                        target_type=target_type,
-                        target_id=target_id,
+            like_model, like_field = CommentLike, 'comment_id'
+        target_author_id = (
+            target_model.objects.filter(pk=target_id).values_list('author_id', flat=True).first()
+        )
+        if target_author_id is None:
+            return Response({'error': f'{target_type.capitalize()} not found'}, status=404)
+        like_kwargs = {'user': request.user, like_field: target_id}
+
+        with transaction.atomic():
+            # LIKE: just try the INSERT. No "does it exist?" SELECT first —
+            # the unique constraint answers that, race-free.
+            if like_model.objects.add(request.user.pk, target_id):
+                # Award karma to the TARGET's author (not the liker)
+                # Don't award self-karma
+                if target_author_id != request.user.id:
+                    karma_event = KarmaEvent.objects.create(
+                        user_id=target_author_id,
+                        amount=karma_amount,
+                        reason=karma_reason,
+                        related_type=target_type,
+                        related_id=target_id,
                     )
-                    # Award karma to the TARGET's author (not the liker)
-                    # Don't award self-karma
-                    if target_author != request.user:
-                        KarmaEvent.objects.create(
-                            user=target_author,
-                            amount=karma_amount,
-                            reason=karma_reason,
-                            related_type=target_type,
-                            related_id=target_id,
-                        )
-                    # Increment like_count (atomic F() expression is race-safe)
-                    if target_type == 'post':
-                        Post.objects.filter(pk=target_id).update(like_count=models.F('like_count') + 1)
-                    else:
-                        Comment.objects.filter(pk=target_id).update(like_count=models.F('like_count') + 1)
-
-            except IntegrityError:
-                # Race condition caught! Another request already created this like.
-                return Response({
-                    'status': 'already_liked',
-                    'target_type': target_type,
-                    'target_id': target_id,
-                    'is_liked': True,
-                })
-
-            return Response({
-                'status': 'liked',
-                'target_type': target_type,
-                'target_id': target_id,
-                'is_liked': True,
-            })
-
-
-# Need models.F for atomic increment
-from django.db import models
+                    KarmaRollup.objects.add([
+                        (karma_event.user_id, karma_event.created_at, karma_event.amount),
+                    ])
+                liked = True
+
+            # Already liked (nothing was inserted) — the toggle turns that
+            # into an UNLIKE: remove like, remove karma
+            else:
+                # _raw_delete: a single DELETE statement, no Collector pass
+                # (likes have no dependents or signals)
+                deleted = like_model.objects.filter(**like_kwargs)._raw_delete(like_model.objects.db)
+                if deleted:
+                    # Remove the karma event for this like (most recent one only)
+                    revoke_karma(target_author_id, karma_reason, target_type, target_id)
+                liked = False
+
+        return Response({
+            'status': 'liked' if liked else 'unliked',
+            'target_type': target_type,
+            'target_id': target_id,
+            'is_liked': liked,
+        })
 
 
 # ─────────────────────────────────────────────────────────────────────
 # LEADERBOARD VIEW — DYNAMIC 24H AGGREGATION
 # ─────────────────────────────────────────────────────────────────────
 
+@method_decorator(
+    cache_control(public=True, max_age=30, stale_while_revalidate=60), name='dispatch'
+)
 class LeaderboardView(APIView):
     """
     GET /api/leaderboard/
 
-    DYNAMIC CALCULATION — no cached "daily karma" field.
+    DYNAMIC CALCULATION — no stored "daily karma" field.
+
+    Karma earned in the last 24 hours, summed per user, top 5.
+
+    The window [now - 24h, now] is split at the first hour boundary:
 
-    We query KarmaEvent directly, filtering to last 24 hours,
-    grouping by user, summing karma, ordering descending, limit 5.
+        cutoff          first full hour                         now
+          |--- partial ---|---------- whole hours ----------------|
+           KarmaEvent       KarmaRollup (one row per user per hour)
+
+    - Whole hours come from KarmaRollup: at most ~25 rows per active user,
+      however many likes there were.
+    - The partial hour at the start comes from KarmaEvent (range scan on
+      the created_at index, at most one hour of likes).
+
+    Both are GROUP BY user_id; the two partial sums are merged in Python
+    and the top 5 taken. The result is exact — same numbers as summing
+    KarmaEvent over the whole window.
 
     The SQL equivalent:
-        SELECT
-            ke.user_id,
-            u.username,
-            SUM(ke.amount) as karma
+        SELECT r.user_id, u.username, SUM(r.amount) AS karma
+        FROM community_karmarollup r
+        JOIN auth_user u ON r.user_id = u.id
+        WHERE r.hour >= :first_full_hour
+        GROUP BY r.user_id, u.username
+
+        SELECT ke.user_id, u.username, SUM(ke.amount) AS karma
         FROM community_karmaevent ke
         JOIN auth_user u ON ke.user_id = u.id
-        WHERE ke.created_at >= (NOW() - INTERVAL '24 hours')
+        WHERE ke.created_at >= :cutoff AND ke.created_at < :first_full_hour
         GROUP BY ke.user_id, u.username
-        ORDER BY karma DESC
-        LIMIT 5
 
-    In Django ORM:
-        KarmaEvent.objects
-            .filter(created_at__gte=cutoff)
-            .values('user__username', 'user_id')
-            .annotate(karma=Sum('amount'))
-            .order_by('-karma')[:5]
+    CACHING (cache-aside, stale-while-revalidate):
+    The leaderboard is the same for every visitor, so the computed board is
+    cached under one shared key (Redis in production, see CACHES in settings)
+    together with the time it stops being fresh.
+    - Fresh (CACHE_TIMEOUT s, plus up to CACHE_JITTER s of random jitter so
+      entries written together don't all expire together): served as-is.
+    - Stale (up to CACHE_STALE s more): ONE request wins cache.add() on a
+      short lock key and recomputes; everyone else keeps getting the stale
+      board meanwhile instead of piling onto the aggregation.
+    - Missing (cold cache): computed inline.
+    No invalidation on likes — a board that is ~30s behind is fine.
+
+    No authentication either: the board is the same for everyone, so
+    there's no point loading the session user just to ignore it. For the
+    same reason browsers and CDNs may cache it too (Cache-Control below),
+    on the same fresh/stale schedule.
     """
+    authentication_classes = []
     permission_classes = [AllowAny]
+    CACHE_KEY = 'v1:karma:leaderboard:24h'
+    CACHE_TIMEOUT = 30  # seconds a computed board counts as fresh
+    CACHE_JITTER = 10   # up to this many extra fresh seconds, chosen at random
+    CACHE_STALE = 60    # seconds past freshness a board may still be served
+    LOCK_TIMEOUT = 5    # seconds; a crashed refresher can't block refreshes longer
 
     def get(self, request):
+        entry = cache.get(self.CACHE_KEY)
+        if entry is None:
+            data = self._refresh()
+        elif entry['fresh_until'] > time.time():
+            data = entry['data']
+        elif cache.add(self.CACHE_KEY + ':lock', 1, self.LOCK_TIMEOUT):
+            try:
+                data = self._refresh()
+            finally:
+                cache.delete(self.CACHE_KEY + ':lock')
+        else:
+            data = entry['data']  # someone else is refreshing it
+        return Response(data)
+
+    def _refresh(self):
+        data = self._compute()
+        fresh_for = self.CACHE_TIMEOUT + random.randint(0, self.CACHE_JITTER)
+        cache.set(
+            self.CACHE_KEY,
+            {'data': data, 'fresh_until': time.time() + fresh_for},
+            fresh_for + self.CACHE_STALE,
+        )
+        return data
+
+    def _compute(self):
         cutoff = timezone.now() - timedelta(hours=24)
+        first_full_hour = KarmaRollup.bucket(cutoff)
+        if first_full_hour < cutoff:
+            first_full_hour += timedelta(hours=1)
 
-        # This is ONE query. Django translates it to the SQL above.
-        leaderboard = (
+        whole_hours = (
+            KarmaRollup.objects
+            .filter(hour__gte=first_full_hour)
+            .values('user_id', 'user__username')
+            .annotate(karma=Sum('amount'))
+            .order_by()
+        )
+        partial_hour = (
             KarmaEvent.objects
-            .filter(created_at__gte=cutoff)
+            .filter(created_at__gte=cutoff, created_at__lt=first_full_hour)
             .values('user_id', 'user__username')
             .annotate(karma=Sum('amount'))
-            .order_by('-karma')[:5]
+            .order_by()
         )
 
+        totals = {}
+        for entry in list(whole_hours) + list(partial_hour):
+            user_id = entry['user_id']
+            if user_id in totals:
+                totals[user_id]['karma'] += entry['karma']
+            else:
+                totals[user_id] = {
+                    'user_id': user_id,
+                    'username': entry['user__username'],
+                    'karma': entry['karma'],
+                }
+
+        # Buckets drained back to zero by unlikes don't put a user on the board
+        top = sorted(
+            (t for t in totals.values() if t['karma']),
+            key=lambda t: (-t['karma'], t['user_id']),
+        )[:5]
+
         # Add rank
-        results = []
-        for rank, entry in enumerate(leaderboard, start=1):
-            results.append({
-                'rank': rank,
-                'user_id': entry['user_id'],
-                'username': entry['user__username'],
-                'karma': entry['karma'],
-            })
-
-        serializer = LeaderboardSerializer(results, many=True)
-        return Response(serializer.data)
+        results = [{'rank': rank, **entry} for rank, entry in enumerate(top, start=1)]
+
+        # Plain list (not ReturnList) so it pickles cleanly into the cache
+        return list(LeaderboardSerializer(results, many=True).data)
@@ -1,12 +1,20 @@
 import os
 from pathlib import Path
 
-BASE_DIR = Path(__file__).resolve().parent.parent
+from django.core.exceptions import ImproperlyConfigured
 
-SECRET_KEY = os.environ.get('SECRET_KEY', 'dev-secret-key-change-in-production-abc123xyz')
+BASE_DIR = Path(__file__).resolve().parent.parent
 
 DEBUG = os.environ.get('DEBUG', 'True').lower() == 'true'
 
+# SECRET_KEY signs the whole session cookie (see SESSION_ENGINE), so anyone
+# who knows it can forge a login: the built-in fallback is for DEBUG only.
+SECRET_KEY = os.environ.get('SECRET_KEY')
+if not SECRET_KEY:
+    if not DEBUG:
+        raise ImproperlyConfigured('SECRET_KEY must be set when DEBUG is off')
+    SECRET_KEY = 'dev-secret-key-change-in-production-abc123xyz'
+
 ALLOWED_HOSTS = os.environ.get('ALLOWED_HOSTS', '*').split(',')
 
 INSTALLED_APPS = [
@@ -22,6 +30,12 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so it compresses the final response body (JSON feed/detail
+    # payloads); whitenoise serves pre-compressed static files itself
+    'django.middleware.gzip.GZipMiddleware',
+    # After GZip, so the ETag is computed on the uncompressed body; answers
+    # If-None-Match with an empty 304 when the content hasn't changed
+    'django.middleware.http.ConditionalGetMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -66,6 +80,37 @@ import dj_database_url
 if 'DATABASE_URL' in os.environ:
     DATABASES['default'] = dj_database_url.config(conn_max_age=600, ssl_require=True)
 
+# Persistent connections on every backend: reuse a worker's connection for
+# up to 10 minutes instead of reconnecting per request; health checks
+# replace a connection that went away instead of erroring the request.
+DATABASES['default']['CONN_MAX_AGE'] = 600
+DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+
+# Cache: Redis in production if REDIS_URL is provided (shared across
+# gunicorn workers), otherwise per-process local memory for development
+if 'REDIS_URL' in os.environ:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Sessions live in a signed cookie (HMAC with SECRET_KEY) instead of the
+# django_session table: no session SELECT on every authenticated request,
+# no session writes on login. Only the auth keys are stored in it.
+# Trade-off: there is no server-side session to delete, so logout only
+# clears the browser's cookie — a copied cookie stays valid until it
+# expires (SESSION_COOKIE_AGE), the user's password changes, or
+# SECRET_KEY is rotated (which logs everyone out).
+SESSION_ENGINE = 'django.contrib.sessions.backends.signed_cookies'
+
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
     {'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator'},
@@ -92,6 +137,10 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'community.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.LimitOffsetPagination',
     'PAGE_SIZE': 20,
 }
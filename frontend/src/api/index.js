@@ -44,8 +44,10 @@ export const authAPI = {
 
 // Posts
 export const postsAPI = {
-  list: (limit = 20, offset = 0) => api.get('/posts/', { params: { limit, offset } }),
-  detail: (id) => api.get(`/posts/${id}/`),
+  // Cursor-paginated: pass the `next` URL's cursor to get the following page
+  list: (pageSize = 20, cursor = null) => api.get('/posts/', { params: { page_size: pageSize, cursor } }),
+  // flat=1: comments come back as a flat list (path order) with parent_id
+  detail: (id) => api.get(`/posts/${id}/`, { params: { flat: 1 } }),
   create: (content) => api.post('/posts/', { content }),
 };
 
@@ -17,7 +17,7 @@ export default function App() {
 
   const fetchPosts = useCallback(async () => {
     try {
-      const res = await postsAPI.list(50, 0);
+      const res = await postsAPI.list(50);
       const data = res.data.results || res.data;
       setPosts(data);
     } catch (err) {
@@ -11,7 +11,7 @@ export default function PostDetail({ postId, onBack }) {
   const fetchPost = () => {
     postsAPI.detail(postId)
       .then(res => {
-        setPost(res.data);
+        setPost({ ...res.data, comments: buildCommentTree(res.data.comments) });
         setLoading(false);
       })
       .catch(err => {
@@ -101,6 +101,25 @@ export default function PostDetail({ postId, onBack }) {
   );
 }
 
+// The API sends comments flat, in path order (parents before children).
+// One pass with a Map<id, node> turns that back into the nested tree
+// CommentTree renders.
+function buildCommentTree(flat) {
+  const byId = new Map();
+  const roots = [];
+  for (const c of flat || []) {
+    const node = { ...c, children: [] };
+    byId.set(node.id, node);
+    const parent = node.parent_id == null ? null : byId.get(node.parent_id);
+    if (parent) {
+      parent.children.push(node);
+    } else if (node.parent_id == null) {
+      roots.push(node);
+    }
+  }
+  return roots;
+}
+
 function countComments(comments) {
   if (!comments) return 0;
   let count = comments.length;